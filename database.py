@@ -1,15 +1,16 @@
 """
 Database Helper Functions
 
-MongoDB helper functions ready to use in your backend code.
-Import and use these functions in your API endpoints for database operations.
+Async MongoDB helper functions (Motor) ready to use in your backend code.
+Import and await these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.write_concern import WriteConcern
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
-from typing import Union
+from typing import List, Union
 from pydantic import BaseModel
 
 # Load environment variables from .env file
@@ -22,11 +23,24 @@ database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    # Keep a few connections warm so the first requests don't pay for the handshake
+    _client = AsyncIOMotorClient(database_url, maxPoolSize=50, minPoolSize=5)
     db = _client[database_name]
 
+# Non-critical collections that don't need to wait for replica/journal acks.
+# Everything else keeps the client's default (strong) write concern.
+_WRITE_CONCERNS = {
+    "contactmessage": WriteConcern(w=1, j=False),
+}
+
+def _collection(collection_name: str):
+    write_concern = _WRITE_CONCERNS.get(collection_name)
+    if write_concern is None:
+        return db[collection_name]
+    return db.get_collection(collection_name, write_concern=write_concern)
+
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -40,16 +54,57 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await _collection(collection_name).insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def create_documents(collection_name: str, items: List[Union[BaseModel, dict]]):
+    """Insert many documents with timestamps in a single round-trip"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    now = datetime.now(timezone.utc)
+    docs = []
+    for data in items:
+        data_dict = data.model_dump() if isinstance(data, BaseModel) else data.copy()
+        data_dict['created_at'] = now
+        data_dict['updated_at'] = now
+        docs.append(data_dict)
+
+    result = await _collection(collection_name).insert_many(docs, ordered=False)
+    return [str(_id) for _id in result.inserted_ids]
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
     """Get documents from collection"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db[collection_name].find(filter_dict or {}, projection)
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(length=limit)
+
+async def get_document(collection_name: str, filter_dict: dict = None, projection: dict = None):
+    """Get a single document from collection (None if no match)"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    return await db[collection_name].find_one(filter_dict or {}, projection)
+
+async def aggregate_documents(collection_name: str, pipeline: list):
+    """Run an aggregation pipeline and return all resulting documents"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    return await db[collection_name].aggregate(pipeline).to_list(length=None)
+
+async def ensure_indexes():
+    """Create the indexes the API queries rely on (no-op if they already exist)"""
+    if db is None:
+        return
+
+    await db["project"].create_index([("tag", 1), ("order", 1)])
+    await db["project"].create_index([("featured", -1)])
+    # "singleton" is never written, so every document indexes it as null and
+    # the unique constraint allows at most one sitesettings document
+    await db["sitesettings"].create_index([("singleton", 1)], unique=True)
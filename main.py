@@ -1,64 +1,228 @@
+import asyncio
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import ValidationError
 from typing import Any, Dict, List, Optional
+import orjson
+from functools import lru_cache
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from schemas import ContactMessage, SiteSettings, Project, ProjectUpdate
-from database import create_document, get_documents
+from database import db, create_document, create_documents, get_document, aggregate_documents, ensure_indexes
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+def _json_default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+class MongoJSONResponse(ORJSONResponse):
+    """ORJSONResponse that serializes ObjectId values natively, so Mongo documents can be returned as-is."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+
+_index_task: Optional[asyncio.Task] = None
+
+async def _create_indexes():
+    try:
+        await ensure_indexes()
+    except Exception:
+        logger.exception("Failed to create MongoDB indexes")
+
+# Contact submissions are buffered and written in batches with insert_many
+_CONTACT_BATCH_SIZE = 50
+_CONTACT_FLUSH_INTERVAL = 0.1
+# Bounded so a database outage can't grow memory without limit; full -> 503
+_CONTACT_QUEUE_MAXSIZE = 1000
+_CONTACT_WRITE_ATTEMPTS = 2
+_CONTACT_RETRY_DELAY = 1.0
+_DUPLICATE_KEY_ERROR = 11000
+# Put on the queue at shutdown to tell the flusher to write what it holds and exit
+_CONTACT_STOP = object()
+# Created on startup so the queue belongs to the running event loop
+_contact_queue: Optional[asyncio.Queue] = None
+_contact_flusher: Optional[asyncio.Task] = None
+
+async def _write_contacts(batch: List[Dict[str, Any]]):
+    # _ids are assigned before enqueueing and inserts are unordered, so
+    # retrying a batch can't create duplicates
+    for attempt in range(1, _CONTACT_WRITE_ATTEMPTS + 1):
+        try:
+            await create_documents("contactmessage", batch)
+            return
+        except BulkWriteError as e:
+            # A duplicate _id means an earlier attempt already stored that message
+            failed = {
+                err["index"] for err in e.details.get("writeErrors", [])
+                if err.get("code") != _DUPLICATE_KEY_ERROR
+            }
+            logger.warning(
+                "Stored %d of %d contact message(s) (attempt %d)",
+                len(batch) - len(failed), len(batch), attempt,
+            )
+            batch = [doc for i, doc in enumerate(batch) if i in failed]
+            if not batch:
+                return
+        except Exception:
+            logger.exception("Failed to store %d contact message(s) (attempt %d)", len(batch), attempt)
+        if attempt < _CONTACT_WRITE_ATTEMPTS:
+            await asyncio.sleep(_CONTACT_RETRY_DELAY)
+    logger.error("Dropped %d contact message(s) after %d attempts", len(batch), _CONTACT_WRITE_ATTEMPTS)
+
+async def _flush_contacts(queue: asyncio.Queue):
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        item = await queue.get()
+        if item is _CONTACT_STOP:
+            break
+        batch = [item]
+        deadline = loop.time() + _CONTACT_FLUSH_INTERVAL
+        while len(batch) < _CONTACT_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _CONTACT_STOP:
+                stopping = True
+                break
+            batch.append(item)
+        await _write_contacts(batch)
+
+async def _start_contact_flusher():
+    global _contact_queue, _contact_flusher
+    _contact_queue = asyncio.Queue(maxsize=_CONTACT_QUEUE_MAXSIZE)
+    _contact_flusher = asyncio.create_task(_flush_contacts(_contact_queue))
+
+async def _stop_contact_flusher():
+    if _contact_queue is None:
+        return
+    # Let the flusher write the batch it is holding rather than cancelling it mid-write
+    if _contact_flusher is not None:
+        await _contact_queue.put(_CONTACT_STOP)
+        await _contact_flusher
+    # Anything enqueued after the stop marker
+    pending = []
+    while not _contact_queue.empty():
+        item = _contact_queue.get_nowait()
+        if item is not _CONTACT_STOP:
+            pending.append(item)
+    if pending:
+        await _write_contacts(pending)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build indexes in the background so an unreachable database doesn't
+    # stall startup until the server-selection timeout
+    global _index_task
+    _index_task = asyncio.create_task(_create_indexes())
+    await _start_contact_flusher()
+    yield
+    await _stop_contact_flusher()
+    if not _index_task.done():
+        _index_task.cancel()
+
+app = FastAPI(default_response_class=MongoJSONResponse, lifespan=lifespan)
+
+# Defaults are literals, so build them once instead of on every settings miss
+_DEFAULT_SETTINGS: Dict[str, Any] = SiteSettings().model_dump()
+
+# Fields the projects listing needs; skips large text like description.
+# GET /api/admin/projects/{project_id} returns the full document for editing.
+_PROJECT_LIST_PROJECTION = {"_id": 1, "title": 1, "tag": 1, "image_url": 1, "featured": 1, "order": 1}
+
+# Fixed allow-lists let Starlette precompute the CORS headers instead of
+# echoing the request's Origin / Access-Control-Request-Headers each time
+_CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", "https://axiom.example.com,http://localhost:3000").split(",")
+    if origin.strip()
+]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=_CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Content-Type", "Authorization"],
 )
 
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Hello from FastAPI Backend!"}
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe; never touches the database"""
+    return {"ok": True}
+
 @app.get("/api/hello")
-def hello():
+async def hello():
     return {"message": "Hello from the backend API!"}
 
 @app.post("/api/contact")
-def submit_contact(payload: Dict[str, Any]):
+async def submit_contact(payload: Dict[str, Any]):
     """Accept contact form submissions and store in MongoDB."""
     try:
         data = ContactMessage(**payload)
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
 
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not available")
+    if _contact_queue is None:
+        raise HTTPException(status_code=503, detail="Contact queue not ready")
+
+    # Assign the id up front so callers still get one back before the batch is written
+    doc = data.model_dump()
+    doc["_id"] = ObjectId()
     try:
-        inserted_id = create_document("contactmessage", data)
-        return {"status": "ok", "id": inserted_id}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        _contact_queue.put_nowait(doc)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Too many pending messages, please retry later")
+    return {"status": "queued", "id": str(doc["_id"])}
 
 # Admin: Site settings (single doc)
 @app.get("/api/admin/settings")
-def get_settings():
+async def get_settings():
     try:
-        items = get_documents("sitesettings", {}, limit=1)
-        if items:
-            doc = items[0]
-            doc["_id"] = str(doc.get("_id"))
-            return doc
-        # if not exists, create defaults
-        default = SiteSettings().model_dump()
-        create_document("sitesettings", default)
-        return default
+        doc = await get_document("sitesettings")
+        if doc:
+            return MongoJSONResponse(content=doc)
+        # if not exists, create defaults; concurrent first requests may race,
+        # so seed with an upsert and read back whichever document won
+        now = datetime.now(timezone.utc)
+        try:
+            await db["sitesettings"].update_one(
+                {},
+                {"$setOnInsert": {**_DEFAULT_SETTINGS, "created_at": now, "updated_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            pass
+        doc = await get_document("sitesettings")
+        return MongoJSONResponse(content=doc)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/admin/settings")
-def upsert_settings(payload: Dict[str, Any]):
-    from database import db
+async def upsert_settings(payload: Dict[str, Any]):
     try:
         data = SiteSettings(**payload)
     except ValidationError as e:
@@ -67,75 +231,125 @@ def upsert_settings(payload: Dict[str, Any]):
         if db is None:
             raise Exception("Database not available")
         col = db["sitesettings"]
-        existing = col.find_one({})
-        if existing:
-            col.update_one({"_id": existing["_id"]}, {"$set": data.model_dump()})
+        now = datetime.now(timezone.utc)
+        update = {"$set": {**data.model_dump(), "updated_at": now}, "$setOnInsert": {"created_at": now}}
+        try:
+            res = await col.update_one({}, update, upsert=True)
+        except DuplicateKeyError:
+            # Lost an insert race on an empty collection; the retry matches the winner's document
+            res = await col.update_one({}, update, upsert=True)
+        if res.matched_count:
             return {"status": "updated"}
-        else:
-            _id = create_document("sitesettings", data)
-            return {"status": "created", "id": _id}
+        return {"status": "created", "id": str(res.upserted_id)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Admin: Projects CRUD
+@lru_cache(maxsize=1024)
+def _oid(value: str) -> ObjectId:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid project id")
+
 @app.get("/api/admin/projects")
-def list_projects(tag: Optional[str] = None):
+async def list_projects(tag: Optional[str] = None):
     try:
         filter_q = {"tag": tag} if tag else {}
-        items = get_documents("project", filter_q)
-        for it in items:
-            it["_id"] = str(it.get("_id"))
-        return items
+        # Let the server stringify _id so no per-item Python fixup is needed
+        items = await aggregate_documents("project", [
+            {"$match": filter_q},
+            {"$project": {**_PROJECT_LIST_PROJECTION, "_id": {"$toString": "$_id"}}},
+        ])
+        # Documents are already JSON-shaped; returning a Response skips FastAPI's jsonable_encoder pass
+        return MongoJSONResponse(content=items)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/admin/projects/{project_id}")
+async def get_project(project_id: str):
+    """Full project document, including the fields the listing leaves out"""
+    oid = _oid(project_id)
+    try:
+        doc = await get_document("project", {"_id": oid})
+        if doc is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        return MongoJSONResponse(content=doc)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/admin/projects")
-def create_project(payload: Dict[str, Any]):
+async def create_project(payload: Dict[str, Any]):
     try:
         data = Project(**payload)
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
     try:
-        _id = create_document("project", data)
+        _id = await create_document("project", data)
         return {"status": "created", "id": _id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/admin/projects/{project_id}")
-def update_project(project_id: str, payload: Dict[str, Any]):
-    from database import db
+async def update_project(project_id: str, payload: Dict[str, Any]):
+    oid = _oid(project_id)
     try:
         data = ProjectUpdate(**payload)
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
+    update_doc = data.model_dump(exclude_unset=True)
+    if not update_doc:
+        return {"status": "unchanged"}
     try:
         if db is None:
             raise Exception("Database not available")
         col = db["project"]
-        res = col.update_one({"_id": ObjectId(project_id)}, {"$set": {k: v for k, v in data.model_dump().items() if v is not None}})
+        res = await col.update_one({"_id": oid}, {"$set": update_doc})
         if res.matched_count == 0:
             raise HTTPException(status_code=404, detail="Project not found")
         return {"status": "updated"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/admin/projects/{project_id}")
-def delete_project(project_id: str):
-    from database import db
+async def delete_project(project_id: str):
+    oid = _oid(project_id)
     try:
         if db is None:
             raise Exception("Database not available")
         col = db["project"]
-        res = col.delete_one({"_id": ObjectId(project_id)})
+        res = await col.delete_one({"_id": oid})
         if res.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Project not found")
         return {"status": "deleted"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Environment doesn't change while the process runs, so check it once
+_DATABASE_URL_STATUS = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
+_DATABASE_NAME_STATUS = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
+
+# /test is for manual debugging; set ENABLE_TEST_ENDPOINT=false to hide it in production
+_TEST_ENDPOINT_ENABLED = os.getenv("ENABLE_TEST_ENDPOINT", "true").lower() not in ("0", "false", "no")
+
+# Short-lived cache so repeated hits don't each run listCollections
+_TEST_CACHE_TTL = 5.0
+_TEST_CACHE: Dict[str, Any] = {"at": 0.0, "body": None}
+
 @app.get("/test")
-def test_database():
+async def test_database():
     """Test endpoint to check if database is available and accessible"""
+    if not _TEST_ENDPOINT_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if _TEST_CACHE["body"] is not None and time.monotonic() - _TEST_CACHE["at"] < _TEST_CACHE_TTL:
+        return _TEST_CACHE["body"]
+
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -146,9 +360,6 @@ def test_database():
     }
     
     try:
-        # Try to import database module
-        from database import db
-        
         if db is not None:
             response["database"] = "✅ Available"
             response["database_url"] = "✅ Configured"
@@ -157,7 +368,7 @@ def test_database():
             
             # Try to list collections to verify connectivity
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]  # Show first 10 collections
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -165,20 +376,28 @@ def test_database():
         else:
             response["database"] = "⚠️  Available but not initialized"
             
-    except ImportError:
-        response["database"] = "❌ Database module not found (run enable-database first)"
     except Exception as e:
         response["database"] = f"❌ Error: {str(e)[:50]}"
     
     # Check environment variables
-    import os
-    response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
-    response["database_name"] = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
-    
+    response["database_url"] = _DATABASE_URL_STATUS
+    response["database_name"] = _DATABASE_NAME_STATUS
+
+    _TEST_CACHE["at"] = time.monotonic()
+    _TEST_CACHE["body"] = response
     return response
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", 2))
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
+        timeout_keep_alive=30,
+    )
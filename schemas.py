@@ -11,9 +11,14 @@ Model name is converted to lowercase for the collection name:
 - BlogPost -> "blogs" collection
 """
 
-from pydantic import BaseModel, Field, EmailStr
+import re
+from pydantic import BaseModel, Field, EmailStr, field_validator
+from pydantic_core import PydanticCustomError
 from typing import Optional, List
 
+# Cheap shape check for high-volume write paths where full EmailStr validation is overkill
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
 # Example schemas (replace with your own):
 
 class User(BaseModel):
@@ -45,11 +50,19 @@ class ContactMessage(BaseModel):
     Collection name: "contactmessage" (lowercase of class name)
     """
     name: str = Field(..., min_length=2, max_length=120, description="Sender full name")
-    email: EmailStr = Field(..., description="Sender email")
+    email: str = Field(..., max_length=254, description="Sender email")
     message: str = Field(..., min_length=10, max_length=5000, description="Message body")
     company: Optional[str] = Field(None, max_length=200, description="Company name (optional)")
     phone: Optional[str] = Field(None, max_length=50, description="Phone or WhatsApp (optional)")
 
+    @field_validator("email")
+    @classmethod
+    def _check_email(cls, v: str) -> str:
+        if not _EMAIL_RE.fullmatch(v):
+            # PydanticCustomError keeps e.errors() JSON-serializable for the 422 detail
+            raise PydanticCustomError("value_error", "value is not a valid email address")
+        return v
+
 # Site settings to drive editable content across the website
 class SiteSettings(BaseModel):
     """Editable site-wide settings (single-document collection: "sitesettings")."""
@@ -84,3 +97,12 @@ class ProjectUpdate(BaseModel):
     case_study_url: Optional[str] = None
     featured: Optional[bool] = None
     order: Optional[int] = Field(None, ge=0)
+
+    # Partial updates only $set fields that were sent, so an explicit null here
+    # would be stored as-is; reject it for fields Project requires
+    @field_validator("title", "tag", "image_url", "featured")
+    @classmethod
+    def _not_null(cls, v):
+        if v is None:
+            raise PydanticCustomError("value_error", "may not be null")
+        return v